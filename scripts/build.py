@@ -3,8 +3,9 @@
 Parse the Epic Games SDK's library to generate a JSON index of its declarations.
 """
 
-from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+import hashlib
 import json
 import logging
 import os
@@ -26,19 +27,59 @@ DEFINES_IGNORE_LIST = set((
     'PROCESS_CATEGORY', 'PROCESS_CATEGORY_LAST',
     ))
 
+HEADER_EXTENSIONS = ('.h', '.inl')
+
+# Parsed indexes are cached on disk keyed by the headers' content so that
+# rebuilding the same SDK version only pays for hashing.
+CACHE_DIR = os.path.expanduser('~/.cache/eos-sdk-json')
+
 DIRECTIVES_IGNORE_LIST = (
     '#pragma',  '#include',
-    '#if', '#else', '#endif', '#ifndef',
+    '#if', '#ifdef', '#else', '#endif', '#ifndef',
     '#undef', '#error'
 )
 
+# Precompiled patterns for the parse_* functions, hoisted out of the per-line hot path.
+DEFINE_RE = re.compile('^#define[ \t]+(?P<defname>[^ \t(]+)([ \t(]*(?P<params>\\([^()])\\))?[ \t(](?P<expr>(.|\n)*)$')
+FUNCTION_RE = re.compile('^EOS_DECLARE_FUNC\\((?P<retval>[^)]+)\\) *(?P<funcname>[a-zA-Z0-9_]+)\\((?P<params>.*)\\);$')
+CALLBACK_RE = re.compile('^(EOS_DECLARE_CALLBACK\\(|EOS_DECLARE_CALLBACK_RETVALUE\\((?P<rettype>[^,]+), *)(?P<cbname>[a-zA-Z0-9_]+),?(?P<params>.*)\\);$')
+STRUCT_FIELD_RE = re.compile(r'^(?P<type>.*) (?P<name>[a-zA-Z0-9_]+)(?P<arrayinfo>\[[A-Za-z0-9_]+\])?;')
+UNION_END_RE = re.compile('^} (?P<name>[a-zA-Z_]+);$')
+UNION_FIELD_RE = re.compile('^(?P<type>.*) (?P<name>[a-zA-Z0-9_[\\]]+);')
+RESULT_VALUE_RE = re.compile('^EOS_RESULT_VALUE(_LAST)?\\((?P<name>[a-zA-Z0-9_]+), (?P<value>[x0-9A-F]+)\\)$')
+ENUM_FIELD_RE = re.compile('^(?P<name>[a-zA-Z0-9_]+)( *= *(?P<value>[x0-9a-f()< ]+))?,?$')
+ENUM_START_END_RE = re.compile('^EOS_ENUM_(START|END)\\((?P<name>[a-zA-Z_]+)\\);?$')
+UI_KEYS_RE = re.compile('^(?P<macro>EOS_UI_KEY([_A-Z]+))\\((?P<prefix>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+)(, (?P<value>.+))?\\)$')
+UI_BUTTONS_RE = re.compile('^(?P<macro>EOS_UI_KEY([_A-Z]+))\\((?P<prefix>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+), (?P<value>.+)\\)$')
+LOG_CATEGORY_RE = re.compile('^(?P<macro>PROCESS_CATEGORY(_LAST)?)\\((?P<alias>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+)(, (?P<value>.+))?\\)$')
+TYPEDEF_RE = re.compile('^(?P<extern>EOS_EXTERN_C )?typedef (?P<type>.+) ((?P<name>[a-zA-Z0-9_]+)|(?P<signature>\\(.*\\* *(?P<name2>[a-zA-Z0-9_]+)\\)\\(.*\\)));$')
+IDENTIFIER_RE = re.compile('^[a-zA-Z0-9_]+$')
+LINE_TOKEN_RE = re.compile('[A-Za-z_#][A-Za-z0-9_#]*')
+
 # These enums are declared in specific directories that force us to pre-declare them.
-SCOPED_ENUMS = OrderedDict(
-    EOS_EResult = OrderedDict(),
-    EOS_ELogCategory = OrderedDict(),
-    EOS_UI_EKeyCombination = OrderedDict(),
-    EOS_UI_EInputStateButtonFlags = OrderedDict(),
-)
+# Values are kept as lists in their final serialization order, with a side set
+# of seen names per enum for the uniqueness checks.
+SCOPED_ENUMS = {
+    'EOS_EResult': [],
+    'EOS_ELogCategory': [],
+    'EOS_UI_EKeyCombination': [],
+    'EOS_UI_EInputStateButtonFlags': [],
+}
+SCOPED_ENUM_NAMES = {enumname: set() for enumname in SCOPED_ENUMS}
+
+def find_content_start(line):
+    """
+    Get the index of the first non-whitespace character of a line.
+    Used with str.startswith offsets to test line prefixes without
+    allocating an lstripped copy of the line.
+
+    :param line: The line to scan
+    """
+    j = 0
+    n = len(line)
+    while j < n and line[j] in ' \t\r\n':
+        j += 1
+    return j
 
 def absorb_comment(lines, i, line = '/*'):
     """
@@ -49,23 +90,19 @@ def absorb_comment(lines, i, line = '/*'):
     :param i: The index of the next line
     :param line: The content of the line where a comment's start was found
     """
-    assert line.lstrip().startswith('/*')
+    assert line.startswith('/*', find_content_start(line))
     line = line[2:].lstrip('*').strip()
-    last_comment = ''
-    while '*/' not in line:
+    comment_parts = []
+    end = line.find('*/')
+    while end < 0:
         line_content = line.lstrip('*').lstrip()
-        if last_comment:
-            last_comment = f"{last_comment}\n{line_content}"
-        else:
-            last_comment = line_content
+        if comment_parts or line_content:
+            comment_parts.append(line_content)
         line = lines[i].strip()
         i += 1
-    line = line.split('*/')[0].rstrip('*').strip()
-    if last_comment:
-        last_comment = f"{last_comment}\n{line}"
-    else:
-        last_comment = line
-    return (i, last_comment.rstrip('\n'))
+        end = line.find('*/')
+    comment_parts.append(line[:end].rstrip('*').strip())
+    return (i, '\n'.join(comment_parts).rstrip('\n'))
 
 def absorb_directive(lines, i, line = '#', comment = '', file = None):
     """
@@ -76,74 +113,106 @@ def absorb_directive(lines, i, line = '#', comment = '', file = None):
     :param line: The content of the line where a directive's start was found
     """
     _ = (comment, file)
-    directive = ''
+    directive_parts = []
     while line.rstrip('\n').endswith('\\'):
-        directive += line.replace('\\\n', '\n')
+        directive_parts.append(line.replace('\\\n', '\n'))
         line = lines[i]
         i+=1
-    return (i, directive + line)
+    directive_parts.append(line)
+    return (i, ''.join(directive_parts))
 
 def explode_parameters(line):
     """
-    Turn a parameters string into an iterator over the line's parameters.
+    Turn a parameters string into a list of the line's parameters.
     The provided string should correspond to the charaters between the function's parenthesis.
 
     :param line: The parameters section of a function
-    :return: An iterator over a list of param dicts with 'name' and 'type' keys
+    :return: A list of param dicts with 'name' and 'type' keys
     """
+    params = []
     for param in line.split(','):
-        param_splitted = param.strip().split(' ')
-        param_name = param_splitted[-1]
-        param_type = ' '.join(param_splitted[0:-1]).strip()
-        yield OrderedDict(name = param_name, type = param_type)
+        param = param.strip()
+        split_at = param.rfind(' ')
+        params.append({
+            'name': param[split_at + 1:],
+            'type': param[:split_at].rstrip() if split_at >= 0 else '',
+        })
+    return params
+
+RECOMMENDED_VALUE_HINT = ': Set this to '
+# Field comments repeat a lot across structs, memoize the scan per comment.
+RECOMMENDED_VALUE_CACHE = {}
+
+def find_recommended_value(comment):
+    """
+    Get the recommended value hinted at by a field's comment, if any.
+
+    :param comment: The comment attached to a struct or union field
+    :return: The recommended value, or None when the comment holds no hint
+    """
+    if comment in RECOMMENDED_VALUE_CACHE:
+        return RECOMMENDED_VALUE_CACHE[comment]
+    value = None
+    hint = comment.find(RECOMMENDED_VALUE_HINT)
+    if hint >= 0:
+        value_start = hint + len(RECOMMENDED_VALUE_HINT)
+        value_end = len(comment)
+        for terminator in '.\r\n':
+            terminator_at = comment.find(terminator, value_start)
+            if 0 <= terminator_at < value_end:
+                value_end = terminator_at
+        if value_end > value_start:
+            value = comment[value_start:value_end]
+    RECOMMENDED_VALUE_CACHE[comment] = value
+    return value
 
 def parse_define(content, i, line, comment = '', file = ''):
     """Extract a #define's content from a list of lines"""
     (i, def_lines) = absorb_directive(content, i, line)
-    definfo = re.match('^#define[ \t]+(?P<defname>[^ \t(]+)([ \t(]*(?P<params>\\([^()])\\))?[ \t(](?P<expr>(.|\n)*)$', def_lines)
+    definfo = DEFINE_RE.match(def_lines)
     assert definfo
     defname = definfo['defname'].strip()
     params = definfo['params'].strip() if definfo['params'] is not None else None
     expr = definfo['expr'].strip()
-    return (i, OrderedDict(
-            comment = comment,
-            expression = expr,
-            name = defname,
-            parameters = params,
-            source = file,
-    ))
+    return (i, {
+            'comment': comment,
+            'expression': expr,
+            'name': defname,
+            'parameters': params,
+            'source': file,
+    })
 
 def parse_function(content, i, line, comment = '', file = ''):
     """Extract a function's signature from a list of lines"""
     _ = content
-    funcinfo = re.match('^EOS_DECLARE_FUNC\\((?P<retval>[^)]+)\\) *(?P<funcname>[a-zA-Z0-9_]+)\\((?P<params>.*)\\);$', line)
+    funcinfo = FUNCTION_RE.match(line)
     assert funcinfo
     retval = funcinfo['retval'].strip()
     funcname = funcinfo['funcname'].strip()
     params = funcinfo['params'].strip()
-    return (i, OrderedDict(
-        comment = comment,
-        methodname_flat = funcname,
-        params = [*explode_parameters(params)] if params not in ('void', '') else [],
-        returntype = retval,
-        source = file,
-    ))
+    return (i, {
+        'comment': comment,
+        'methodname_flat': funcname,
+        'params': explode_parameters(params) if params not in ('void', '') else [],
+        'returntype': retval,
+        'source': file,
+    })
 
 def parse_callback(content, i, line, comment = '', file = ''):
     """Extract a callback's signature from a list of lines"""
     _ = content
-    cbinfo = re.match('^(EOS_DECLARE_CALLBACK\\(|EOS_DECLARE_CALLBACK_RETVALUE\\((?P<rettype>[^,]+), *)(?P<cbname>[a-zA-Z0-9_]+),?(?P<params>.*)\\);$', line)
+    cbinfo = CALLBACK_RE.match(line)
     assert cbinfo
     rettype = cbinfo['rettype'].strip() if cbinfo['rettype'] is not None else 'void'
     cbname = cbinfo['cbname'].strip()
     params = cbinfo['params'].strip()
-    return (i, OrderedDict(
-        callbackname = cbname,
-        comment = comment,
-        params = [*explode_parameters(params)],
-        returntype = rettype,
-        source = file,
-    ))
+    return (i, {
+        'callbackname': cbname,
+        'comment': comment,
+        'params': explode_parameters(params),
+        'returntype': rettype,
+        'source': file,
+    })
 
 def parse_struct_union(content, i, line, comment = ''):
     """Extract a struct's union's signature from a list of lines"""
@@ -151,67 +220,84 @@ def parse_struct_union(content, i, line, comment = ''):
     assert content[i].strip() == '{'
     i += 1
 
-    union = OrderedDict(
-        comment = comment,
-        name = '',
-        type = '',
-        unionitems = [],
-    )
-    union_content = ''
+    union = {
+        'comment': comment,
+        'name': '',
+        'type': '',
+        'unionitems': [],
+    }
+    union_lines = []
+    content_len = len(content)
 
-    while i < len(content):
+    while i < content_len:
         line = content[i].strip()
         i += 1
         last_comment = ''
-        if line.lstrip().startswith('/*'):
-            while line.lstrip().startswith('/*'):
-                (i, last_comment) = absorb_comment(content, i, line)
-                if i >= len(content):
-                    i += 1
-                    break
-                line = content[i]
+        start = 0
+        while line.startswith('/*', start):
+            (i, last_comment) = absorb_comment(content, i, line)
+            if i >= content_len:
                 i += 1
-            if i > len(content):
-                continue
+                break
+            line = content[i]
+            i += 1
+            start = find_content_start(line)
+        if i > content_len:
+            continue
 
         if line == '':
             continue
 
         if line.startswith('}'):
-            lineinfo = re.match('^} (?P<name>[a-zA-Z_]+);$', line)
+            lineinfo = UNION_END_RE.match(line)
             assert lineinfo
             union['name'] = lineinfo['name']
-            union['type'] = f"union\n{union_content}\n\u007d"
+            union['type'] = '\n'.join(['union', '', *union_lines, '\u007d'])
             return (i, union)
 
-        union_content = f"{union_content}\n{line}"
+        union_lines.append(line)
 
-        declinfo = re.match('^(?P<type>.*) (?P<name>[a-zA-Z0-9_[\\]]+);', line)
+        declinfo = UNION_FIELD_RE.match(line)
         assert declinfo is not None
-        attribute_info = OrderedDict(
-            comment = last_comment,
-            name = declinfo['name'].strip(),
-            recommended_value = None,
-            type = declinfo['type'].strip(),
-        )
-        comment_info = re.search(': Set this to (?P<value>[^.\r\n]+)([.\r\n]|$)', last_comment)
-        if comment_info:
-            attribute_info['recommended_value'] = comment_info['value']
-        else:
-            del attribute_info['recommended_value']
+        attribute_info = {
+            'comment': last_comment,
+            'name': declinfo['name'].strip(),
+        }
+        recommended_value = find_recommended_value(last_comment)
+        if recommended_value is not None:
+            attribute_info['recommended_value'] = recommended_value
+        attribute_info['type'] = declinfo['type'].strip()
         union['unionitems'].append(attribute_info)
 
     raise Exception('Reached end of file without exiting union context')
 
+def parse_macro_header(line, prefix, tail):
+    """
+    Get the name declared by a fixed-shape macro opening line such as
+    'EOS_STRUCT(<name>, (' or 'EOS_ENUM(<name>,'. The shape is fixed, so a
+    couple of slices extract the name faster than the regex engine.
+
+    :param line: The opening line
+    :param prefix: The opening text, up to and including the parenthesis
+    :param tail: The expected content after the name's comma
+    """
+    assert line.startswith(prefix)
+    name_end = line.find(',', len(prefix))
+    assert name_end >= 0
+    name = line[len(prefix):name_end]
+    assert IDENTIFIER_RE.match(name)
+    assert line[name_end + 1:].strip(' \r\n') == tail
+    return name
+
 def parse_struct(content, i, line, comment = '', file = ''):
     """Extract a struct's signature from a list of lines"""
-    structinfo = re.match('^EOS_STRUCT\\((?P<name>[a-zA-Z0-9_]+), *\\($', line)
-    assert structinfo
+    struct_name = parse_macro_header(line, 'EOS_STRUCT(', '(')
     struct_attrs = []
     end_found = False
     last_comment = ''
+    content_len = len(content)
 
-    while i < len(content):
+    while i < content_len:
         line = content[i].strip()
         i += 1
         if line == '':
@@ -226,57 +312,54 @@ def parse_struct(content, i, line, comment = '', file = ''):
             continue
 
         is_comment = line.startswith('/*')
-        declinfo = re.match(r'^(?P<type>.*) (?P<name>[a-zA-Z0-9_]+)(?P<arrayinfo>\[[A-Za-z0-9_]+\])?;', line)
+        declinfo = STRUCT_FIELD_RE.match(line)
         assert is_comment or declinfo
         if is_comment:
             (i, last_comment) = absorb_comment(content, i, line)
         elif declinfo:
-            attribute_info = OrderedDict(
-                comment = last_comment,
-                name = declinfo['name'],
-                recommended_value = None,
-                type = declinfo['type']+(declinfo['arrayinfo'] or ''),
-            )
-            comment_info = re.search(': Set this to (?P<value>[^.\r\n]+)([.\r\n]|$)', last_comment)
-            if comment_info:
-                attribute_info['recommended_value'] = comment_info['value']
-            else:
-                del attribute_info['recommended_value']
+            attribute_info = {
+                'comment': last_comment,
+                'name': declinfo['name'],
+            }
+            recommended_value = find_recommended_value(last_comment)
+            if recommended_value is not None:
+                attribute_info['recommended_value'] = recommended_value
+            attribute_info['type'] = declinfo['type']+(declinfo['arrayinfo'] or '')
             struct_attrs.append(attribute_info)
             last_comment = ''
     assert end_found
 
-    return (i, OrderedDict(
-        comment = comment,
-        fields = struct_attrs,
-        source = file,
-        struct = structinfo['name'],
-    ))
+    return (i, {
+        'comment': comment,
+        'fields': struct_attrs,
+        'source': file,
+        'struct': struct_name,
+    })
 
 def parse_result_value(content, i, line, comment = '', file = ''):
     """Extract an EOS_RESULT enum value from a list of lines"""
     _ = (content, file)
-    valinfo = re.match('^EOS_RESULT_VALUE(_LAST)?\\((?P<name>[a-zA-Z0-9_]+), (?P<value>[x0-9A-F]+)\\)$', line)
+    valinfo = RESULT_VALUE_RE.match(line)
     assert valinfo
     name = valinfo['name'].strip()
     value = valinfo['value'].strip()
-    return (i, OrderedDict(
-        comment = comment,
-        name = name,
-        value = value
-    ))
+    return (i, {
+        'comment': comment,
+        'name': name,
+        'value': value
+    })
 
 def parse_enum(content, i, line, comment = '', file = ''):
     """Extract an enum's content from a list of lines"""
-    enuminfo = re.match('^EOS_ENUM\\((?P<name>[a-zA-Z0-9_]+), *$', line)
-    assert enuminfo
-    enum_name = enuminfo['name']
-    enum_attrs = OrderedDict()
+    enum_name = parse_macro_header(line, 'EOS_ENUM(', '')
+    enum_values = []
+    enum_names = set()
 
     last_enum_value = -1
     last_comment = ''
     end_found = False
-    while i < len(content):
+    content_len = len(content)
+    while i < content_len:
         line = content[i].strip()
         i += 1
         if line == '':
@@ -285,100 +368,104 @@ def parse_enum(content, i, line, comment = '', file = ''):
             end_found = True
             break
 
-        is_comment = '/*' in line
-        declinfo = re.match('^(?P<name>[a-zA-Z0-9_]+)( *= *(?P<value>[x0-9a-f()< ]+))?,?$', line)
-        assert is_comment or declinfo
-        if is_comment:
+        if '/*' in line:
             (i, last_comment) = absorb_comment(content, i, line)
-        elif declinfo:
-            assert declinfo['name'] not in enum_attrs
-            if declinfo['value'] is not None:
-                last_enum_value = declinfo['value']
-            else:
-                last_enum_value = str(int(last_enum_value) + 1)
-            enum_value = str(last_enum_value)
-            enum_attrs[declinfo['name']] = OrderedDict(
-                comment = last_comment,
-                name = declinfo['name'],
-                value = enum_value,
-            )
-            last_comment = ''
+            continue
+        declinfo = ENUM_FIELD_RE.match(line)
+        assert declinfo
+        assert declinfo['name'] not in enum_names
+        enum_names.add(declinfo['name'])
+        if declinfo['value'] is not None:
+            last_enum_value = declinfo['value']
         else:
-            last_comment = ''
+            last_enum_value = str(int(last_enum_value) + 1)
+        enum_value = str(last_enum_value)
+        enum_values.append({
+            'comment': last_comment,
+            'name': declinfo['name'],
+            'value': enum_value,
+        })
+        last_comment = ''
     assert end_found
-    return (i, OrderedDict(
-        comment = comment,
-        enumname = enum_name,
-        source = file,
-        values = enum_attrs,
-    ))
+    return (i, {
+        'comment': comment,
+        'enumname': enum_name,
+        'source': file,
+        'values': enum_values,
+    })
 
 def parse_enum_start_end(content, i, line, comment = '', file = ''):
     """Extract an enum start's name"""
     _ = content
-    enuminfo = re.match('^EOS_ENUM_(START|END)\\((?P<name>[a-zA-Z_]+)\\);?$', line)
+    enuminfo = ENUM_START_END_RE.match(line)
     assert enuminfo
     assert enuminfo['name'] in SCOPED_ENUMS
-    return (i, OrderedDict(
-        comment = comment,
-        enumname = enuminfo['name'],
-        source = file,
-        values = SCOPED_ENUMS[enuminfo['name']],
-    ))
-
-def parse_ui_enum(i, line, comment = '', file = '', enum_last_index = 0):
-    """Extract an ui enum's content from a list of lines"""
-    if file == 'eos_ui_keys.h':
-        valinfo = re.match('^(?P<macro>EOS_UI_KEY([_A-Z]+))\\((?P<prefix>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+)(, (?P<value>.+))?\\)$', line)
-        assert valinfo
-        macro = valinfo['macro'].strip()
-        prefix = valinfo['prefix'].strip()
-        name = valinfo['name'].strip()
-        value = valinfo['value'].strip() if valinfo['value'] is not None else None
-        if value is None:
-            assert macro in ('EOS_UI_KEY_ENTRY', 'EOS_UI_KEY_CONSTANT_LAST')
-            enum_last_index += 1
-            value = f"{enum_last_index}"
-        if macro == 'EOS_UI_KEY_ENTRY_FIRST':
-            enum_last_index = int(value)
-        effective_name = prefix + name
-        return (i, 'EOS_UI_EKeyCombination', enum_last_index, OrderedDict(
-            comment = comment,
-            name = effective_name,
-            value = value,
-        ))
-    if file == 'eos_ui_buttons.h':
-        valinfo = re.match('^(?P<macro>EOS_UI_KEY([_A-Z]+))\\((?P<prefix>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+), (?P<value>.+)\\)$', line)
-        assert valinfo
-        macro = valinfo['macro'].strip()
-        prefix = valinfo['prefix'].strip()
-        name = valinfo['name'].strip()
-        value = valinfo['value'].strip()
-        effective_name = prefix + name
-        return (i, 'EOS_UI_EInputStateButtonFlags', enum_last_index, OrderedDict(
-            comment = comment,
-            name = effective_name,
-            value = value,
-        ))
-    assert False
+    return (i, {
+        'comment': comment,
+        'enumname': enuminfo['name'],
+        'source': file,
+        'values': SCOPED_ENUMS[enuminfo['name']],
+    })
+
+def parse_ui_keys(i, line, comment = '', enum_last_index = 0):
+    """Extract an ui key enum value from an eos_ui_keys.h line"""
+    valinfo = UI_KEYS_RE.match(line)
+    assert valinfo
+    macro = valinfo['macro'].strip()
+    prefix = valinfo['prefix'].strip()
+    name = valinfo['name'].strip()
+    value = valinfo['value'].strip() if valinfo['value'] is not None else None
+    if value is None:
+        assert macro in ('EOS_UI_KEY_ENTRY', 'EOS_UI_KEY_CONSTANT_LAST')
+        enum_last_index += 1
+        value = f"{enum_last_index}"
+    if macro == 'EOS_UI_KEY_ENTRY_FIRST':
+        enum_last_index = int(value)
+    effective_name = prefix + name
+    return (i, 'EOS_UI_EKeyCombination', enum_last_index, {
+        'comment': comment,
+        'name': effective_name,
+        'value': value,
+    })
+
+def parse_ui_buttons(i, line, comment = '', enum_last_index = 0):
+    """Extract an ui button enum value from an eos_ui_buttons.h line"""
+    valinfo = UI_BUTTONS_RE.match(line)
+    assert valinfo
+    prefix = valinfo['prefix'].strip()
+    name = valinfo['name'].strip()
+    value = valinfo['value'].strip()
+    effective_name = prefix + name
+    return (i, 'EOS_UI_EInputStateButtonFlags', enum_last_index, {
+        'comment': comment,
+        'name': effective_name,
+        'value': value,
+    })
+
+# Bound once per processed file so that the per-line UI branch does not
+# re-test the file name on every value.
+UI_ENUM_PARSERS = {
+    'eos_ui_keys.h': parse_ui_keys,
+    'eos_ui_buttons.h': parse_ui_buttons,
+}
 
 def parse_log_enum_value(content, i, line, comment = '', file = ''):
-    valinfo = re.match('^(?P<macro>PROCESS_CATEGORY(_LAST)?)\\((?P<alias>[a-zA-Z0-9_]+), (?P<name>[a-zA-Z0-9_]+)(, (?P<value>.+))?\\)$', line)
+    valinfo = LOG_CATEGORY_RE.match(line)
     assert valinfo
     macro = valinfo['macro'].strip()
     alias = valinfo['alias'].strip()
     name = valinfo['name'].strip()
     value = valinfo['value'].strip()
-    return (i, OrderedDict(
-        comment = comment,
-        name = name,
-        value = value,
-    ))
+    return (i, {
+        'comment': comment,
+        'name': name,
+        'value': value,
+    })
 
 def parse_typedef(content, i, line, comment = '', file = ''):
     """Extract a typedef's content from a list of lines"""
     _ = (content, file)
-    definfo = re.match('^(?P<extern>EOS_EXTERN_C )?typedef (?P<type>.+) ((?P<name>[a-zA-Z0-9_]+)|(?P<signature>\\(.*\\* *(?P<name2>[a-zA-Z0-9_]+)\\)\\(.*\\)));$', line)
+    definfo = TYPEDEF_RE.match(line)
     assert definfo
     defname = definfo['name'] or definfo['name2'].strip()
     deftype = definfo['type'].strip() + (
@@ -391,18 +478,18 @@ def parse_typedef(content, i, line, comment = '', file = ''):
         split_type = deftype.split('(*)')
         assert len(split_type) == 2
         assert split_type[1].startswith('(') and split_type[1].endswith(')')
-        functype = OrderedDict(
-            returntype = split_type[0].strip(),
-            params = [*explode_parameters(split_type[1][1:-1])] if split_type[1] not in ('void', '') else [],
-        )
-    definition = OrderedDict(
-        comment = comment,
-        extern = definfo['extern'] is not None,
-        functype = functype,
-        name = defname,
-        source = file,
-        type = deftype,
-    )
+        functype = {
+            'returntype': split_type[0].strip(),
+            'params': explode_parameters(split_type[1][1:-1]) if split_type[1] not in ('void', '') else [],
+        }
+    definition = {
+        'comment': comment,
+        'extern': definfo['extern'] is not None,
+        'functype': functype,
+        'name': defname,
+        'source': file,
+        'type': deftype,
+    }
     if not definition['functype']:
         del definition['functype']
     return (i, definition)
@@ -412,94 +499,216 @@ def parse_skip_line(content, i, line, comment = '', file = ''):
     _ = (content, line, comment, file)
     return (i, None)
 
+def iter_header_files(dir_path):
+    """
+    Iterate over the name and path of all header files in a directory.
+    Entries are yielded in sorted order, parent directories first, to match
+    the order a sorted os.walk would produce.
+
+    :param dir_path: The path of the directory to scan
+    """
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        for entry in sorted(entries, key = lambda entry: entry.name):
+            if entry.is_dir(follow_symlinks = False):
+                subdirs.append(entry.path)
+            elif entry.name.endswith(HEADER_EXTENSIONS):
+                yield (entry.name, entry.path)
+    for subdir in subdirs:
+        yield from iter_header_files(subdir)
+
+def read_header_file(path):
+    """Load the content of a single header file as a list of LF-terminated lines."""
+    with open(path, 'rb') as handle:
+        text = handle.read().decode('utf8')
+    # Normalize newlines like text-mode reads did so that the $-anchored
+    # patterns keep matching headers shipped with CRLF line endings.
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.splitlines(keepends = True)
+
 def build_header_file_index(dir_path):
     """Load the content of all header files in a directory."""
     files_index = {}
-    for path, dirs, files in os.walk(dir_path):
-        dirs.sort()
-        for file in sorted(files):
+    headers = [*iter_header_files(dir_path)]
+    with ThreadPoolExecutor(max_workers = 8) as executor:
+        contents = executor.map(read_header_file, [path for (_, path) in headers])
+        for (file, _), content in zip(headers, contents):
             assert file not in files_index
-            if any(file.endswith(ext) for ext in ('.h', '.inl')):
-                with open(os.path.join(path, file), 'r', encoding='utf8') as handle:
-                    files_index[file] = handle.readlines()
+            files_index[file] = content
     return files_index
 
-def build_file_read_order(files_index):
-    """From a list of header files, determine in which order they should be parsed."""
-    # List includes for each files
-    files_priority = OrderedDict()
+def build_include_index(files_index):
+    """List the local headers included by each loaded header file."""
+    files_priority = {}
     for file, content in files_index.items():
         includes = set()
         for line in content:
             if line.startswith('#include '):
-                included = re.match('^#include +(?P<path>[^ ]+)$', line)
-                assert included
-                path = included['path'].strip()
+                # The directive's shape is fixed, a slice beats the regex here.
+                path = line[9:].strip()
+                assert path and ' ' not in path
                 if path.startswith('"') and path.endswith('"'):
-                    if any(file.endswith(ext) for ext in ('.h', '.inl')):
+                    if file.endswith(HEADER_EXTENSIONS):
                         assert path[1:-1] in files_index
                         includes.add(path[1:-1])
-                elif (path.startswith('<') and path.endswith('>')) or re.match('^[a-zA-Z0-9_]+$', path):
+                elif (path.startswith('<') and path.endswith('>')) or IDENTIFIER_RE.match(path):
                     pass
                 else:
                     assert False
         files_priority[file] = includes
+    return files_priority
+
+def build_file_read_order(files_index):
+    """From a list of header files, determine in which order they should be parsed."""
+    # List includes for each files
+    files_priority = build_include_index(files_index)
 
     # Exclude .inl files that are never included in .h files
+    included_by = {}
+    for f, included_files in files_priority.items():
+        for included in included_files:
+            included_by.setdefault(included, []).append(f)
     excluded_files = []
     for f in files_priority:
-        if f.endswith('.inl') and not any(k.endswith('.h') and f in v for k,v in files_priority.items()):
+        if f.endswith('.inl') and not any(k.endswith('.h') for k in included_by.get(f, ())):
             excluded_files.append(f)
     for f in excluded_files:
         del files_priority[f]
 
-    # Sort in inclusion order
+    # Sort in inclusion order. Remaining files are swept repeatedly in walk
+    # order and emitted as soon as all their includes are resolved, with a
+    # file emitted earlier in a sweep counting as resolved for the files
+    # after it. This reproduces the historical order exactly (the output
+    # JSON ordering, and thus the release checksum, depends on it); the
+    # incremental resolved set only replaces the per-file set(files_order)
+    # rebuild the previous version paid for.
     files_order = []
-    while files_priority:
-        to_pop = []
-        for filename, included_files in files_priority.items():
-            new_v = included_files - set(files_order)
-            if len(new_v) == 0:
+    resolved = set()
+    remaining = [*files_priority]
+    while remaining:
+        next_remaining = []
+        for filename in remaining:
+            if files_priority[filename] <= resolved:
                 files_order.append(filename)
-                to_pop.append(filename)
-                continue
-            if len(new_v) != len(included_files):
-                files_priority[filename] = new_v
-        for filename in to_pop:
-            files_priority.pop(filename)
+                resolved.add(filename)
+            else:
+                next_remaining.append(filename)
+        assert len(next_remaining) < len(remaining)
+        remaining = next_remaining
 
     return files_order
 
-def assert_insert(target, value_key, value):
-    """Ensure that a value is not already inserted before injecting it"""
-    assert value[value_key] not in target
-    target[value[value_key]] = value
+def assert_append(target, seen, value_key, value):
+    """Ensure that a value's key was not seen before appending it to a list"""
+    assert value[value_key] not in seen
+    seen.add(value[value_key])
+    target.append(value)
 
-def assert_insert_if(target, ignores, value_key, value):
-    """Ensure that a value should not be ignored and is not already inserted before injecting it"""
+def assert_append_if(target, seen, ignores, value_key, value):
+    """Ensure that a value should not be ignored and was not seen before appending it to a list"""
     if value[value_key] == 'EOS_AntiCheatClient_ReceiveMessageFromPeer':
         assert False
     if value[value_key] not in ignores:
-        assert value[value_key] not in target
-        target[value[value_key]] = value
+        assert value[value_key] not in seen
+        seen.add(value[value_key])
+        target.append(value)
+
+def hash_files_index(files_index):
+    """
+    Build a cache key identifying the content of all loaded header files.
+    The key also covers this script so that parser changes invalidate old entries.
+
+    :param files_index: The files to hash, as built by build_header_file_index
+    """
+    digest = hashlib.blake2b(digest_size = 16)
+    with open(__file__, 'rb') as handle:
+        digest.update(handle.read())
+    for file, content in files_index.items():
+        digest.update(file.encode('utf8'))
+        digest.update(b'\0')
+        digest.update(''.join(content).encode('utf8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def load_cached_index(cache_path):
+    """Get a previously parsed index back from the cache if one exists."""
+    try:
+        with open(cache_path, 'r', encoding = 'utf8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+def save_cached_index(cache_path, json_index):
+    """Store a parsed index in the cache. Failing to write is not an error."""
+    temp_path = f"{cache_path}.{os.getpid()}"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok = True)
+        with open(temp_path, 'w', encoding = 'utf8') as handle:
+            json.dump(json_index, handle)
+        os.replace(temp_path, cache_path)
+    except OSError as error:
+        logger.warning('Could not write the index cache to %s: %s', cache_path, error)
 
 def noop(*args, **kwargs):
     """Just do nothing"""
     return (args, kwargs)
 
-def index_sdk_directory(dir_path): # pylint: disable=too-many-locals
+def index_sdk_directory(dir_path):
     """
     Parse the Epic Games SDK's library to generate an index of its declarations.
+    Header sets already parsed by this version of the script are served from
+    the on-disk cache.
     """
-    defines = OrderedDict()
-    functions = OrderedDict()
-    callbacks = OrderedDict()
-    structs = OrderedDict()
-    typedefs = OrderedDict()
-    enums = OrderedDict()
-
-    # Index all headers
     files_index = build_header_file_index(dir_path)
+    cache_path = os.path.join(CACHE_DIR, f"{hash_files_index(files_index)}.json")
+    cached_index = load_cached_index(cache_path)
+    if cached_index is not None:
+        return cached_index
+    json_index = parse_files_index(files_index)
+    save_cached_index(cache_path, json_index)
+    return json_index
+
+def build_dispatch_table(categories, seen):
+    """
+    Build the table mapping a line's leading token to its parser and the
+    registrar recording the parsed declaration in the matching category.
+    """
+    flags = [
+        ('EOS_DECLARE_FUNC', parse_function, partial(assert_append, categories['functions'], seen['functions'], 'methodname_flat')),
+        (('EOS_DECLARE_CALLBACK', 'EOS_DECLARE_CALLBACK_RETVALUE'), parse_callback,
+            partial(assert_append, categories['callbacks'], seen['callbacks'], 'callbackname')),
+        ('EOS_STRUCT', parse_struct, partial(assert_append, categories['structs'], seen['structs'], 'struct')),
+        (('EOS_RESULT_VALUE', 'EOS_RESULT_VALUE_LAST'), parse_result_value,
+            partial(assert_append, SCOPED_ENUMS['EOS_EResult'], SCOPED_ENUM_NAMES['EOS_EResult'], 'name')),
+        (('PROCESS_CATEGORY', 'PROCESS_CATEGORY_LAST'), parse_log_enum_value,
+            partial(assert_append, SCOPED_ENUMS['EOS_ELogCategory'], SCOPED_ENUM_NAMES['EOS_ELogCategory'], 'name')),
+        ('EOS_ENUM_START', parse_enum_start_end, partial(assert_append, categories['enums'], seen['enums'], 'enumname')),
+        ('EOS_ENUM_END', parse_enum_start_end, noop),
+        ('EOS_ENUM_BOOLEAN_OPERATORS', parse_skip_line, noop),
+        ('EOS_ENUM', parse_enum, partial(assert_append, categories['enums'], seen['enums'], 'enumname')),
+        ('#define', parse_define, partial(assert_append_if, categories['defines'], seen['defines'], DEFINES_IGNORE_LIST, 'name')),
+        (('typedef', 'EOS_EXTERN_C'), parse_typedef, partial(assert_append, categories['typedefs'], seen['typedefs'], 'name')),
+        (DIRECTIVES_IGNORE_LIST, absorb_directive, noop)
+    ]
+    # Flatten the dispatch table to one entry per leading token so that each
+    # line costs a single dict lookup instead of a scan over every prefix.
+    dispatch = {}
+    for (linestart, callback, registrar) in flags:
+        for token in (linestart,) if isinstance(linestart, str) else linestart:
+            dispatch[token] = (callback, registrar)
+    return dispatch
+
+def parse_files_index(files_index): # pylint: disable=too-many-locals
+    """
+    Parse loaded SDK headers to generate an index of their declarations.
+    """
+    # Each category accumulates its declarations in serialization order, with
+    # a side set of seen keys for the uniqueness checks.
+    categories = {category: [] for category in ('defines', 'functions', 'callbacks', 'structs', 'typedefs', 'enums')}
+    seen = {category: set() for category in categories}
+    dispatch = build_dispatch_table(categories, seen)
+
     files_order = build_file_read_order(files_index)
     # Overwride eos_base as it mostly provides hard-to-parse definitions.
     assert 'eos_base.h' in files_order
@@ -509,69 +718,71 @@ def index_sdk_directory(dir_path): # pylint: disable=too-many-locals
         '#define EOS_FALSE ((EOS_Bool)0)',
     ]
 
-    flags = [
-        ('EOS_DECLARE_FUNC', parse_function, partial(assert_insert, functions, 'methodname_flat')),
-        ('EOS_DECLARE_CALLBACK', parse_callback, partial(assert_insert, callbacks, 'callbackname')),
-        ('EOS_STRUCT', parse_struct, partial(assert_insert, structs, 'struct')),
-        ('EOS_RESULT_VALUE', parse_result_value, partial(assert_insert, SCOPED_ENUMS['EOS_EResult'], 'name')),
-        ('PROCESS_CATEGORY', parse_log_enum_value, partial(assert_insert, SCOPED_ENUMS['EOS_ELogCategory'], 'name')),
-        ('EOS_ENUM_START', parse_enum_start_end, partial(assert_insert, enums, 'enumname')),
-        ('EOS_ENUM_END', parse_enum_start_end, noop),
-        ('EOS_ENUM_BOOLEAN_OPERATORS', parse_skip_line, noop),
-        ('EOS_ENUM', parse_enum, partial(assert_insert, enums, 'enumname')),
-        ('#define', parse_define, partial(assert_insert_if, defines, DEFINES_IGNORE_LIST, 'name')),
-        (('typedef', 'EOS_EXTERN_C'), parse_typedef, partial(assert_insert, typedefs, 'name')),
-        (DIRECTIVES_IGNORE_LIST, absorb_directive, noop)
-    ]
+    # Local bindings of the per-line callables, loading a local is cheaper
+    # than a global or attribute lookup in this loop.
+    match_token = LINE_TOKEN_RE.match
+    dispatch_get = dispatch.get
+    find_start = find_content_start
+    read_comment = absorb_comment
     # Build API index
     for file in files_order:
         content = files_index[file]
+        content_len = len(content)
+        ui_parser = UI_ENUM_PARSERS.get(file)
         i = 0
         enum_last_index = 0
         last_file_comment = ''
-        while i < len(content):
+        while i < content_len:
             line = content[i]
             i += 1
             last_file_comment = ''
 
-            if line.lstrip().startswith('/*'):
-                while line.lstrip().startswith('/*'):
-                    (i, last_file_comment) = absorb_comment(content, i, line)
-                    if i >= len(content):
-                        i += 1
-                        break
-                    line = content[i]
-                    i += 1
-                if i > len(content):
-                    continue
+            # Blank lines are the most common case, skip them before paying
+            # for the comment scan and the dispatch lookup.
+            if line == '\n':
+                continue
 
-            for (linestart, callback, registrar) in flags:
-                if any(line.startswith(s) for s in ((linestart,) if isinstance(linestart, str) else linestart)):
-                    (i, definition) = callback(content, i, line, last_file_comment, file)
-                    registrar(definition)
+            start = find_start(line)
+            while line.startswith('/*', start):
+                (i, last_file_comment) = read_comment(content, i, line)
+                if i >= content_len:
+                    i += 1
                     break
+                line = content[i]
+                i += 1
+                start = find_start(line)
+            if i > content_len:
+                continue
+
+            token = match_token(line)
+            line_handler = dispatch_get(token[0]) if token else None
+            if line_handler:
+                (callback, registrar) = line_handler
+                (i, definition) = callback(content, i, line, last_file_comment, file)
+                registrar(definition)
             else:
                 if line.startswith('EOS_UI_'):
-                    (i, parent, enum_last_index, definition) = parse_ui_enum(i, line, last_file_comment, file, enum_last_index)
+                    assert ui_parser
+                    (i, parent, enum_last_index, definition) = ui_parser(i, line, last_file_comment, enum_last_index)
                     assert parent in SCOPED_ENUMS
-                    assert definition['name'] not in SCOPED_ENUMS[parent]
-                    SCOPED_ENUMS[parent][definition['name']] = definition
+                    assert_append(SCOPED_ENUMS[parent], SCOPED_ENUM_NAMES[parent], 'name', definition)
 
-                elif line.lstrip().startswith('//') or line.strip() == '':
+                elif line.startswith('//', start) or start == len(line):
                     pass
 
                 else:
                     logger.error("Found unrecognized / unsupported prefix: %s", line)
                     assert False
 
-    return OrderedDict(
-        callback_methods = [*callbacks.values()],
-        defines = [*defines.values()],
-        enums = [sort_dict(OrderedDict(values = [*v.pop('values').values()], **v)) for v in enums.values()],
-        functions = [*functions.values()],
-        structs = [*structs.values()],
-        typedefs = [*typedefs.values()],
-    )
+    json_index = {
+        'callback_methods': categories['callbacks'],
+        'defines': categories['defines'],
+        'enums': [sort_dict(enum) for enum in categories['enums']],
+        'functions': categories['functions'],
+        'structs': categories['structs'],
+        'typedefs': categories['typedefs'],
+    }
+    return json_index
 
 def sort_list_items(data):
     """Helper function to sort alphabetically the dicts in a list"""
@@ -583,11 +794,11 @@ def sort_list_items(data):
 
 def sort_dict(data):
     """Helper function to input alphabetically the keys of a dict"""
-    return OrderedDict(
-        (k, sort_dict(v) if isinstance(v, dict) else (
+    return {
+        k: sort_dict(v) if isinstance(v, dict) else (
             sort_list_items(v) if isinstance(v, (list, tuple)) else v
-        )) for k, v in sorted(data.items())
-    )
+        ) for k, v in sorted(data.items())
+    }
 
 if __name__ == '__main__':
     import sys
@@ -604,17 +815,17 @@ if __name__ == '__main__':
                 sdk_dir = os.path.join(sdk_dir, 'SDK')
             sdk_dir = os.path.join(sdk_dir, 'Include')
 
-        json_index = OrderedDict()
+        json_index = {}
         if metadata:
             json_index['metadata'] = sort_dict(metadata)
         json_index.update(index_sdk_directory(sdk_dir))
-        index_string = json.dumps(json_index, indent = 2)
 
         if output_file == '-':
-            print(index_string)
+            json.dump(json_index, sys.stdout, indent = 2, separators = (',', ': '))
+            sys.stdout.write('\n')
         else:
             with open(output_file, 'w', encoding = 'utf8') as file_handle:
-                file_handle.write(index_string)
+                json.dump(json_index, file_handle, indent = 2, separators = (',', ': '))
         return 0
 
     handler = logging.StreamHandler(sys.stderr)